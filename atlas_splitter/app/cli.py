@@ -1,7 +1,7 @@
 """The atlas-splitter command line launcher"""
 
-import json
 import logging
+from pathlib import Path
 
 import click
 import pandas as pd
@@ -16,6 +16,7 @@ from voxcell import VoxelData
 
 from atlas_splitter.barrel_splitter import somatosensory_barrels
 from atlas_splitter.layer_splitter import isocortex_layer_23
+from atlas_splitter.utils import load_json, load_nrrd, save_json
 from atlas_splitter.version import VERSION as __version__
 
 L = logging.getLogger(__name__)
@@ -30,6 +31,17 @@ class NaturalOrderGroup(click.Group):
         return list(self.commands)
 
 
+def _load_annotation(annotation_path: str, output_annotation_path: str, mmap: bool) -> VoxelData:
+    """Load the annotation file, memory-mapped if `mmap` is True."""
+    if mmap and Path(annotation_path).resolve() == Path(output_annotation_path).resolve():
+        raise click.BadParameter(
+            "A memory-mapped annotation file cannot be overwritten.",
+            param_hint="'--output-annotation-path'",
+        )
+
+    return load_nrrd(annotation_path, mmap=mmap)
+
+
 @click.group(cls=NaturalOrderGroup)
 @click.version_option(__version__)
 def cli():
@@ -47,6 +59,21 @@ def cli():
 )
 @click.option("--output-hierarchy-path", required=True, help="Path of the json file to write")
 @click.option("--output-annotation-path", required=True, help="Path of the nrrd file to write")
+@click.option(
+    "--compact-json",
+    is_flag=True,
+    default=False,
+    help="Write the output hierarchy file without indentation, which is faster.",
+)
+@click.option(
+    "--mmap",
+    is_flag=True,
+    default=False,
+    help=(
+        "Memory-map the annotation file instead of loading it in memory. "
+        "Only uncompressed (raw encoding) annotation files can be memory-mapped."
+    ),
+)
 @log_args(L)
 def split_barrel_columns(  # pylint: disable=too-many-arguments
     verbose,
@@ -55,6 +82,8 @@ def split_barrel_columns(  # pylint: disable=too-many-arguments
     barrels_path,
     output_hierarchy_path,
     output_annotation_path,
+    compact_json,
+    mmap,
 ):
     """Introduce the barrel columns to SSp-bfd (primary somatosensory barrel cortex)
     in the mouse annotations in place. Positions of the voxels need to be specified by a DataFrame.
@@ -69,18 +98,18 @@ def split_barrel_columns(  # pylint: disable=too-many-arguments
     set_verbose(L, verbose)
 
     L.info("Loading files ...")
-    barrel_positions = pd.read_feather(barrels_path)
-    annotation = VoxelData.load_nrrd(annotation_path)
+    barrel_positions = pd.read_feather(
+        barrels_path, columns=["barrel", "x", "y", "z"], use_threads=True
+    )
+    annotation = _load_annotation(annotation_path, output_annotation_path, mmap)
 
-    with open(hierarchy_path, "r", encoding="utf-8") as h_file:
-        hierarchy = json.load(h_file)
+    hierarchy = load_json(hierarchy_path)
 
     L.info("Introduce the barrel columns to SSp-bfd...")
     somatosensory_barrels.split_barrels(hierarchy, annotation, barrel_positions)
 
     L.info("Saving modified hierarchy and annotation files ...")
-    with open(output_hierarchy_path, "w", encoding="utf-8") as out:
-        json.dump(hierarchy, out, indent=1, separators=(",", ": "))
+    save_json(output_hierarchy_path, hierarchy, compact=compact_json)
     annotation.save_nrrd(output_annotation_path)
 
 
@@ -98,6 +127,21 @@ def split_barrel_columns(  # pylint: disable=too-many-arguments
 )
 @click.option("--output-hierarchy-path", required=True, help="Path of the json file to write")
 @click.option("--output-annotation-path", required=True, help="Path of the nrrd file to write")
+@click.option(
+    "--compact-json",
+    is_flag=True,
+    default=False,
+    help="Write the output hierarchy file without indentation, which is faster.",
+)
+@click.option(
+    "--mmap",
+    is_flag=True,
+    default=False,
+    help=(
+        "Memory-map the annotation file instead of loading it in memory. "
+        "Only uncompressed (raw encoding) annotation files can be memory-mapped."
+    ),
+)
 @log_args(L)
 def split_isocortex_layer_23(  # pylint: disable=too-many-arguments
     verbose,
@@ -106,6 +150,8 @@ def split_isocortex_layer_23(  # pylint: disable=too-many-arguments
     direction_vectors_path,
     output_hierarchy_path,
     output_annotation_path,
+    compact_json,
+    mmap,
 ):
     """Split the layer 2/3 of the AIBS mouse isocortex and save modified hierarchy and
     annotation files.
@@ -121,9 +167,8 @@ def split_isocortex_layer_23(  # pylint: disable=too-many-arguments
     set_verbose(L, verbose)
 
     L.info("Loading files ...")
-    annotation = VoxelData.load_nrrd(annotation_path)
-    with open(hierarchy_path, "r", encoding="utf-8") as h_file:
-        hierarchy = json.load(h_file)
+    annotation = _load_annotation(annotation_path, output_annotation_path, mmap)
+    hierarchy = load_json(hierarchy_path)
     direction_vectors = VoxelData.load_nrrd(direction_vectors_path)
 
     # Splits and updates in place hierarchy and annotations
@@ -131,6 +176,5 @@ def split_isocortex_layer_23(  # pylint: disable=too-many-arguments
     isocortex_layer_23.split(hierarchy, annotation, direction_vectors.raw)
 
     L.info("Saving modified hierarchy and annotation files ...")
-    with open(output_hierarchy_path, "w", encoding="utf-8") as out:
-        json.dump(hierarchy, out, indent=1, separators=(",", ": "))
+    save_json(output_hierarchy_path, hierarchy, compact=compact_json)
     annotation.save_nrrd(output_annotation_path)
@@ -12,7 +12,6 @@ The code relays on pd.DataFrame containing the annotated positions of each barre
 in x,y,z coordinates.
 """
 
-import copy
 import logging
 from typing import Any, Dict, List, Set
 
@@ -68,15 +67,12 @@ def get_hierarchy_by_acronym(hierarchy: HierarchyDict, region_map: RegionMap, st
     indices = region_map.find(start_acronym, attr="acronym", with_descendants=False)
     start_index = indices.pop()
 
-    hierarchy_levels = np.array(region_map.get(start_index, attr="acronym", with_ascendants=True))
-    iso_index = np.where(hierarchy_levels == "Isocortex")[0][0]
-    hierarchy_levels = hierarchy_levels[:iso_index]
+    hierarchy_levels = region_map.get(start_index, attr="acronym", with_ascendants=True)
+    hierarchy_levels = hierarchy_levels[: hierarchy_levels.index("Isocortex")]
     hierarchy_ = get_isocortex_hierarchy(hierarchy)
 
     for acronym in hierarchy_levels[::-1]:
-        for index, child in enumerate(hierarchy_["children"]):
-            if child["acronym"] == acronym:
-                hierarchy_ = hierarchy_["children"][index]
+        hierarchy_ = {child["acronym"]: child for child in hierarchy_["children"]}[acronym]
 
     return hierarchy_
 
@@ -114,12 +110,10 @@ def region_logical_and(positions: np.ndarray, annotation: VoxelData, indices: Li
         np.ndarray: A 3D numpy array of the same shape as `annotation.data` containing
         the resulting binary mask after performing the logical AND operation (bool values).
     """
-    mask = positions_to_mask(positions, annotation)
-    if len(indices) == 1:
-        region_mask = annotation.raw == indices[0]
-    else:
-        region_mask = np.isin(annotation.raw, indices)
-    layer_barrel = np.logical_and(region_mask, mask).astype(bool)
+    # Only the barrel voxels are compared: no dense mask of the region nor of the positions.
+    voxel_indices = tuple(annotation.positions_to_indices(positions).T)
+    layer_barrel = np.zeros(annotation.shape, dtype=bool)
+    layer_barrel[voxel_indices] = np.isin(annotation.raw[voxel_indices], indices)
     return layer_barrel
 
 
@@ -136,9 +130,10 @@ def add_hierarchy_child(
         acronym: The acronym for the child.
 
     Returns:
-        A new copy of the parent structure with the child added to it.
+        A shallow copy of the parent structure, without children, turned into the new child.
     """
-    new_child = copy.deepcopy(parent)
+    new_child = dict(parent)
+    new_child["children"] = []
     new_child["parent_structure_id"] = parent["id"]
     new_child["acronym"] = acronym
     new_child["name"] = name
@@ -175,7 +170,7 @@ def edit_hierarchy(  # pylint: disable=too-many-arguments
     Args:
         region (str): Barrel region acronym. Example: SSp-bdf2
         hierarchy (HierarchyDict): brain regions hierarchy dict
-        new_ids (Dict[int, Dict[str, int]]): set of new ids
+        new_ids (Dict[str, Dict[str, int]]): new ids of each barrel and of its layers
         region_map (RegionMap): region map object from voxcell
         layers (list): list of layers to be integrated
     """
@@ -203,7 +198,6 @@ def edit_hierarchy(  # pylint: disable=too-many-arguments
             )
             assert new_barrel_layer["acronym"].endswith(layer)
 
-            new_barrel_layer["children"] = []
             if layer == "2/3":
                 children23 = []
                 for sublayer in ["2", "3"]:
@@ -213,7 +207,6 @@ def edit_hierarchy(  # pylint: disable=too-many-arguments
                         f"{new_barrel['name']} layer {sublayer}",
                         _acronym(region, name, sublayer),
                     )
-                    layer23_child["children"] = []
                     _assert_is_leaf_node(layer23_child)
 
                     children23.append(layer23_child)
@@ -258,17 +251,67 @@ def edit_volume(
         region_map (RegionMap): region map object from voxcell
         barrel_positions (pd.DataFrame): x,y,z voxel positions
         layers (list): list of layers to be integrated
-        new_ids (Dict[int, Dict[str, int]]): set of new ids
+        new_ids (Dict[str, Dict[str, int]]): new ids of each barrel and of its layers
     """
-    for name in barrel_positions.barrel.unique():
-        positions = barrel_positions[barrel_positions.barrel == name][["x", "y", "z"]].values
-        for layer in layers:
-            region = f"SSp-bfd{layer}"
-            new_id = new_ids[name][layer]
-            region_indices = list(region_map.find(region, attr="acronym", with_descendants=True))
-            layer_barrel = region_logical_and(positions, annotation, region_indices)
+    # pylint: disable=too-many-locals
+    # All barrels are edited at once, by reading and writing only the voxels of the barrels.
+    barrel_of_position, barrel_names = pd.factorize(barrel_positions["barrel"])
+    order = np.argsort(barrel_of_position, kind="stable")
+    flat_indices = np.ravel_multi_index(
+        np.asarray(
+            annotation.positions_to_indices(barrel_positions[["x", "y", "z"]].to_numpy()[order]),
+            dtype=np.intp,
+        ).T,
+        annotation.shape,
+    )
+    # Each voxel is processed once. A voxel shared by several barrels is assigned to the barrel
+    # which comes first in `barrel_positions`.
+    voxels, first = np.unique(flat_indices, return_index=True)
+    barrel_of_voxel = barrel_of_position[order][first]
+    voxel_indices = np.unravel_index(voxels, annotation.shape)
+    layer_of_voxel = _layer_indices(
+        annotation.raw[voxel_indices],
+        [
+            region_map.find(f"SSp-bfd{layer}", attr="acronym", with_descendants=True)
+            for layer in layers
+        ],
+    )
+
+    # new_layer_ids[barrel, layer] is the new id of the layer of the barrel.
+    new_layer_ids = np.array(
+        [[new_ids[name][layer] for layer in layers] for name in barrel_names], dtype=np.int64
+    ).reshape(len(barrel_names), len(layers))
+    in_layers = layer_of_voxel >= 0
+    annotation.raw[tuple(indices[in_layers] for indices in voxel_indices)] = new_layer_ids[
+        barrel_of_voxel[in_layers], layer_of_voxel[in_layers]
+    ]
+
+
+def _layer_indices(ids: np.ndarray, layers_ids: List[Set[int]]) -> np.ndarray:
+    """Find the index of the layer each identifier belongs to.
+
+    Region identifiers can be as large as 4e9 (see `atlas_splitter.utils.MAX_CUSTOM_ID`), hence
+    the lookup is performed by a binary search in the sorted identifiers of all layers rather
+    than with a dense lookup table.
+
+    Args:
+        ids: array of region identifiers, e.g., annotation values.
+        layers_ids: list of the sets of region identifiers of each layer.
+
+    Returns:
+        integer array of the same shape as `ids` holding the index in `layers_ids` of the first
+        layer containing each identifier, or -1 if no layer contains it.
+    """
+    region_ids = np.array([id_ for layer_ids in layers_ids for id_ in layer_ids], dtype=np.int64)
+    layer_of_region = np.repeat(np.arange(len(layers_ids)), [len(ids_) for ids_ in layers_ids])
+    if len(region_ids) == 0:
+        return np.full(ids.shape, -1)
+
+    order = np.argsort(region_ids, kind="stable")
+    region_ids, layer_of_region = region_ids[order], layer_of_region[order]
+    positions = np.minimum(np.searchsorted(region_ids, ids), len(region_ids) - 1)
 
-            annotation.raw[layer_barrel] = new_id
+    return np.where(region_ids[positions] == ids, layer_of_region[positions], -1)
 
 
 def split_barrels(
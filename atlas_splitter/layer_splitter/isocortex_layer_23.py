@@ -20,10 +20,9 @@ decide whether a voxel belongs either to layer 2 or layer 3.
 """
 from __future__ import annotations
 
-import copy
 import logging
 from collections import defaultdict
-from typing import Any, Dict, Set
+from typing import Any, Dict, Optional, Set
 
 import numpy as np
 from atlas_commons.typing import BoolArray, FloatArray, NDArray
@@ -31,7 +30,12 @@ from cgal_pybind import slice_volume
 from voxcell import RegionMap, VoxelData
 
 from atlas_splitter.exceptions import AtlasSplitterError
-from atlas_splitter.utils import _assert_is_leaf_node, get_isocortex_hierarchy, id_from_acronym
+from atlas_splitter.utils import (
+    _assert_is_leaf_node,
+    get_isocortex_hierarchy,
+    id_from_acronym,
+    unique_acronym_to_id,
+)
 
 L = logging.getLogger(__name__)
 
@@ -49,6 +53,7 @@ def edit_hierarchy(
     new_layer_ids: Dict[int, Dict[str, int]],
     ids_to_reuse: Dict[int, Dict[str, int]],
     region_map: RegionMap,
+    acronym_to_id: Optional[Dict[str, int]] = None,
 ) -> None:
     """
     Edit in place layer 2/3 into 2 and 3 within the hierarchy dict.
@@ -60,7 +65,8 @@ def edit_hierarchy(
     hierarchy. Otherwise, the identifier of n is reused and the node n is removed from the
     hierarchy.
 
-    The function is recursive and modifies in-place `hierarchy`, `new_layer_ids` and `ids_to_reuse`.
+    The tree is traversed iteratively (depth-first) and the function modifies in-place
+    `hierarchy`, `new_layer_ids` and `ids_to_reuse`.
 
     Note: Isocortex identifiers correponding to layer 2/3 are assumed to be leaf
     region identifiers. These observations are based on
@@ -87,6 +93,11 @@ def edit_hierarchy(
             Note: with unmodified AIBS 1.json the only ids to be reused are {195, 747, 524, 606}.
                 They correspond to region name endings with "layer 2" only.
         region_map: map to navigate the brain regions hierarchy.
+        acronym_to_id: (optional) dict mapping the acronyms carried by a single region of the
+            whole brain hierarchy to their identifiers, as returned by
+            :fun:`atlas_splitter.utils.unique_acronym_to_id`. It must be built from the same
+            hierarchy as `region_map`. Defaults to None, in which case every layer 2/3 region is
+            looked up with `region_map`.
 
     Note:
         The following attributes of the created nodes are copies of the
@@ -103,49 +114,65 @@ def edit_hierarchy(
         FIXME(Luc): The meaning of st_level and atlas_id is still unclear at the moment, see
         https://community.brain-map.org/t/what-is-the-meaning-of-atlas-id-and-st-level-in-1-json
     """
-    to_delete = []
-    for index, child in enumerate(hierarchy["children"]):
-        if child["acronym"].endswith(("2", "3")) and not child["acronym"].endswith("2/3"):
-            _assert_is_leaf_node(child)  # Satisfied by AIBS 1.json
-            num = child["acronym"][-1]
-            assert child["name"].endswith(num)  # idem
-            ids = region_map.find(child["acronym"][:-1] + "2/3", attr="acronym")
-            assert len(ids) == 1  # idem
-            ids_to_reuse[ids.pop()][f"layer_{num}"] = child["id"]
-            to_delete.append(index)
-
-    for index in sorted(to_delete, reverse=True):
-        del hierarchy["children"][index]
-
-    for child in hierarchy["children"]:
-        if child["acronym"].endswith("2/3"):
-            _assert_is_leaf_node(child)  # Satisfied by AIBS 1.json
-            assert child["name"].endswith("2/3")  # idem
-
-            # Create children
-            new_children = []
-            for layer in ["layer_2", "layer_3"]:
-                new_child = copy.deepcopy(child)
-                new_child["acronym"] = child["acronym"][:-3] + layer[-1]
-                if child["id"] in ids_to_reuse and layer in ids_to_reuse[child["id"]]:
-                    new_layer_ids[child["id"]][layer] = ids_to_reuse[child["id"]][layer]
-                else:
-                    extra_ids = set(new_layer_ids.keys()) | set(
-                        id_ for c in new_layer_ids.values() for id_ in c.values()
-                    )
-                    new_layer_ids[child["id"]][layer] = id_from_acronym(
-                        region_map, new_child["acronym"], extra_ids
-                    )
-                new_child["name"] = child["name"][:-3]
-                new_child["id"] = new_layer_ids[child["id"]][layer]
-                new_child["name"] = new_child["name"] + layer[-1]
-                new_child["parent_structure_id"] = child["id"]
-                new_children.append(new_child)
-
-            # Populate the current 2/3 leaf node's children
-            child["children"] = new_children
-        else:
-            edit_hierarchy(child, new_layer_ids, ids_to_reuse, region_map)
+    # pylint: disable=too-many-locals
+    # Acronyms which are missing from the index, in particular those carried by several regions
+    # of the whole brain hierarchy, are looked up with `region_map` below, where the uniqueness
+    # assertion fails for duplicates.
+    if acronym_to_id is None:
+        acronym_to_id = {}
+    nodes = [hierarchy]
+    while nodes:
+        node = nodes.pop()
+        to_delete = []
+        children_to_visit = []
+        for index, child in enumerate(node["children"]):
+            if child["acronym"].endswith(("2", "3")) and not child["acronym"].endswith("2/3"):
+                _assert_is_leaf_node(child)  # Satisfied by AIBS 1.json
+                num = child["acronym"][-1]
+                assert child["name"].endswith(num)  # idem
+                id_ = acronym_to_id.get(child["acronym"][:-1] + "2/3")
+                if id_ is None:
+                    ids = region_map.find(child["acronym"][:-1] + "2/3", attr="acronym")
+                    assert len(ids) == 1  # idem
+                    id_ = ids.pop()
+                ids_to_reuse[id_][f"layer_{num}"] = child["id"]
+                to_delete.append(index)
+
+        for index in sorted(to_delete, reverse=True):
+            del node["children"][index]
+
+        for child in node["children"]:
+            if child["acronym"].endswith("2/3"):
+                _assert_is_leaf_node(child)  # Satisfied by AIBS 1.json
+                assert child["name"].endswith("2/3")  # idem
+
+                # Create children
+                new_children = []
+                for layer in ["layer_2", "layer_3"]:
+                    new_child = {**child, "children": []}
+                    new_child["acronym"] = child["acronym"][:-3] + layer[-1]
+                    if child["id"] in ids_to_reuse and layer in ids_to_reuse[child["id"]]:
+                        new_layer_ids[child["id"]][layer] = ids_to_reuse[child["id"]][layer]
+                    else:
+                        extra_ids = set(new_layer_ids.keys()) | set(
+                            id_ for c in new_layer_ids.values() for id_ in c.values()
+                        )
+                        new_layer_ids[child["id"]][layer] = id_from_acronym(
+                            region_map, new_child["acronym"], extra_ids
+                        )
+                    new_child["name"] = child["name"][:-3]
+                    new_child["id"] = new_layer_ids[child["id"]][layer]
+                    new_child["name"] = new_child["name"] + layer[-1]
+                    new_child["parent_structure_id"] = child["id"]
+                    new_children.append(new_child)
+
+                # Populate the current 2/3 leaf node's children
+                child["children"] = new_children
+            else:
+                children_to_visit.append(child)
+
+        # Visit the remaining children depth-first, in their order of appearance
+        nodes.extend(reversed(children_to_visit))
 
 
 def _edit_layer_23_hierarchy(
@@ -159,8 +186,8 @@ def _edit_layer_23_hierarchy(
     layer 3.
 
     Args:
-        hierarchy: brain regions hierarchy dict.
-        region_map: map to navigate the brain regions hierarchy.
+        hierarchy: AIBS 1.json brain regions hierarchy dict.
+        region_map: map to navigate the brain regions hierarchy, built from `hierarchy`.
 
     Returns:
         dict of the same form as the argument `new_layer_ids` of
@@ -176,16 +203,43 @@ def _edit_layer_23_hierarchy(
         new_layer_ids,
         ids_to_reuse,
         region_map,
+        # `region_map` is built from the whole brain hierarchy, so is the acronym index.
+        acronym_to_id=unique_acronym_to_id(hierarchy["msg"][0]),
     )
 
     return new_layer_ids
 
 
+def _as_ids_array(ids: Set[int], dtype: np.dtype) -> NDArray[np.number]:
+    """
+    Convert a set of region identifiers into a sorted array of the annotation dtype.
+
+    Comparing the annotation with an array of its own dtype avoids the upcast of the whole
+    volume (e.g., from uint32 to int64) by `np.isin`. Identifiers which cannot be represented by
+    an integer `dtype` cannot be found in the annotation and are discarded. If `dtype` is not an
+    integer type (e.g., float32), the identifiers are returned as int64 values.
+
+    Args:
+        ids: set of region identifiers.
+        dtype: dtype of the annotated volume.
+
+    Returns:
+        sorted array of the representable identifiers, of type `dtype` if it is an integer type,
+        int64 otherwise.
+    """
+    if not np.issubdtype(dtype, np.integer):
+        return np.array(sorted(ids), dtype=np.int64)
+
+    info = np.iinfo(dtype)
+    return np.array(sorted(id_ for id_ in ids if info.min <= id_ <= info.max), dtype=dtype)
+
+
 def _edit_layer_23_volume(
     volume: NDArray[np.integer],
-    layer_2_mask: BoolArray,
+    splitting: NDArray[np.integer],
     layer_23_ids: Set[int],
     new_layer_ids: Dict[int, Dict[str, int]],
+    region_mask: Optional[BoolArray] = None,
 ) -> None:
     """
     Edit layer 2/3 into 2 and 3.
@@ -195,34 +249,38 @@ def _edit_layer_23_volume(
 
     Args:
         volume: whole brain annotated volume.
-        layer_2_mask: binary mask of the voxels sitting in layer 2.
+        splitting: integer array of the same shape as `volume` as returned by
+            `cgal_pybind.slice_volume`. The voxels of layer 2, which are the shallowest, are
+            labeled with 2.
         layer_23_ids: the set of all layer 2/3 identifiers,
             i.e., the identifiers whose corresponding acronyms and names
             end with '2/3'.
         new_layer_ids:
             dict of the same form as the argument `new_layer_ids` of
             :fun:`atlas_splitter.layer_splitter.isocortex_layer_23,py.edit_hierarchy`
+        region_mask: (optional) binary mask of a region containing every layer 2/3 voxel.
+            If specified, only the voxels of this region are scanned. Defaults to None, in which
+            case the whole volume is scanned.
     """
 
-    def change_volume(id_: int, new_id: int, layer_mask: BoolArray) -> None:
-        """
-        Modify `volume` by a assigining a new identifier to the voxels defined by `layer_mask`.
-
-        The modification is done in place.
-
-        Args:
-            id_: the original identifier to be changed.
-            new_id: the new identifier to be assigned.
-            layer_mask: binary mask of the voxels of the layer where the change is requested.
-        """
-        change_to_layer = np.logical_and(volume == id_, layer_mask)
-        if np.any(change_to_layer):
-            volume[change_to_layer] = new_id
-
-    layer_3_mask = np.invert(layer_2_mask)
-    for id_ in layer_23_ids:
-        change_volume(id_, new_layer_ids[id_]["layer_2"], layer_2_mask)
-        change_volume(id_, new_layer_ids[id_]["layer_3"], layer_3_mask)
+    # Voxels outside layer 2/3 are left unchanged: only layer 2/3 voxels are read and written.
+    ids = _as_ids_array(layer_23_ids, volume.dtype)
+    if region_mask is None:
+        layer_23_indices = np.nonzero(np.isin(volume, ids))
+    else:
+        region_indices = np.nonzero(region_mask)
+        is_layer_23 = np.isin(volume[region_indices], ids)
+        layer_23_indices = tuple(indices[is_layer_23] for indices in region_indices)
+
+    # new_ids[i] holds the new layer 3 and layer 2 identifiers of ids[i], in this order.
+    new_ids = np.array(
+        [[new_layer_ids[id_]["layer_3"], new_layer_ids[id_]["layer_2"]] for id_ in ids.tolist()],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    volume[layer_23_indices] = new_ids[
+        np.searchsorted(ids, volume[layer_23_indices]),
+        (splitting[layer_23_indices] == 2).astype(np.intp),
+    ]
 
 
 def split(
@@ -257,12 +315,20 @@ def split(
     assert "msg" in hierarchy, "Wrong hierarchy input. The AIBS 1.json file is expected."
     region_map = RegionMap.from_dict(hierarchy["msg"][0])
     isocortex_ids = region_map.find("Isocortex", attr="acronym", with_descendants=True)
-    layers_2_and_3_ids = isocortex_ids & region_map.find(
-        "@.*2(/3)?$", attr="acronym", with_descendants=True
-    )
+    # Layer 2 and layer 2/3 regions are leaves of the AIBS hierarchy: a single pass over the
+    # isocortex acronyms is enough to collect them, no descendants need to be added.
+    layers_2_and_3_ids = set()
+    layer_23_ids = set()
+    for id_ in isocortex_ids:
+        acronym = region_map.get(id_, "acronym")
+        if acronym.endswith("2/3"):
+            layer_23_ids.add(id_)
+            layers_2_and_3_ids.add(id_)
+        elif acronym.endswith("2"):
+            layers_2_and_3_ids.add(id_)
 
     # No direction vectors should be [NaN, NaN, NaN] inside the region to split
-    volume = np.isin(annotation.raw, list(layers_2_and_3_ids))
+    volume = np.isin(annotation.raw, _as_ids_array(layers_2_and_3_ids, annotation.raw.dtype))
     if np.any(np.isnan(direction_vectors[volume])):
         raise AtlasSplitterError(
             "The 3D region to split, that is layer 2/3, contains [NaN, NaN, NaN] "
@@ -286,7 +352,6 @@ def split(
         thicknesses=[1.0 - thickness_ratio, thickness_ratio],
         resolution=0.5,
     )
-    layer_23_ids = isocortex_ids & region_map.find("@.*2/3$", attr="acronym", with_descendants=True)
 
     L.info("Editing hierarchy ...")
     new_layer_ids = _edit_layer_23_hierarchy(
@@ -295,7 +360,8 @@ def split(
     L.info("Editing annotation ...")
     _edit_layer_23_volume(
         annotation.raw,
-        splitting == 2,  # the voxels of layer 2 are the shallowest; they are located in slice 2.
+        splitting,
         layer_23_ids,
         new_layer_ids,
+        region_mask=volume,
     )
@@ -3,9 +3,14 @@ from __future__ import annotations
 
 import hashlib
 import logging
-from typing import Any, Dict
+import os
+from pathlib import Path
+from typing import Any, Dict, Union
 
-from voxcell import RegionMap, VoxcellError
+import nrrd
+import numpy as np
+import orjson
+from voxcell import RegionMap, VoxcellError, VoxelData
 
 from atlas_splitter.exceptions import AtlasSplitterError
 
@@ -16,6 +21,149 @@ HierarchyDict = Dict[str, Any]
 MIN_CUSTOM_ID = 1_000_000_000
 MAX_CUSTOM_ID = 4_000_000_000
 
+# Data types of the nrrd specification, see http://teem.sourceforge.net/nrrd/format.html#type
+_NRRD_TYPES: Dict[str, np.dtype] = {
+    name: np.dtype(dtype)
+    for dtype, names in {
+        "i1": ["signed char", "int8", "int8_t"],
+        "u1": ["uchar", "unsigned char", "uint8", "uint8_t"],
+        "i2": ["short", "short int", "signed short", "signed short int", "int16", "int16_t"],
+        "u2": ["ushort", "unsigned short", "unsigned short int", "uint16", "uint16_t"],
+        "i4": ["int", "signed int", "int32", "int32_t"],
+        "u4": ["uint", "unsigned int", "uint32", "uint32_t"],
+        "i8": [
+            "longlong",
+            "long long",
+            "long long int",
+            "signed long long",
+            "signed long long int",
+            "int64",
+            "int64_t",
+        ],
+        "u8": ["ulonglong", "unsigned long long", "unsigned long long int", "uint64", "uint64_t"],
+        "f4": ["float"],
+        "f8": ["double"],
+    }.items()
+    for name in names
+}
+
+
+def load_json(path: Union[str, Path]) -> Any:
+    """Load a json file with orjson.
+
+    Args:
+        path: path to the json file, e.g., the AIBS 1.json hierarchy file.
+
+    Returns:
+        The deserialized json content.
+    """
+    return orjson.loads(Path(path).read_bytes())  # pylint: disable=no-member
+
+
+def save_json(path: Union[str, Path], data: Any, compact: bool = False) -> None:
+    """Write `data` to a json file with orjson.
+
+    Args:
+        path: path of the json file to write.
+        data: json-serializable object, e.g., a brain regions hierarchy dict. NumPy scalars and
+            arrays are serialized as json numbers and lists.
+        compact: if True, the json content is written without any whitespace. Otherwise it is
+            indented with 2 spaces.
+    """
+    option = orjson.OPT_SERIALIZE_NUMPY  # pylint: disable=no-member
+    if not compact:
+        option |= orjson.OPT_INDENT_2  # pylint: disable=no-member
+    Path(path).write_bytes(orjson.dumps(data, option=option))  # pylint: disable=no-member
+
+
+def _nrrd_dtype(header: Dict[str, Any]) -> np.dtype | None:
+    """Return the dtype of the data of a raw-encoded nrrd file, or None if it is not supported.
+
+    Args:
+        header: header of the nrrd file, as returned by `nrrd.read_header`.
+
+    Returns:
+        dtype of the data, including its byte order, or None if the nrrd type or endianness is
+        not supported.
+    """
+    dtype = _NRRD_TYPES.get(header["type"])
+    if dtype is None:
+        return None
+    if dtype.itemsize == 1:
+        return dtype
+    if header.get("endian") not in ("little", "big"):
+        return None
+
+    return dtype.newbyteorder("<" if header["endian"] == "little" else ">")
+
+
+def _is_diagonal(directions: Any) -> bool:
+    """Return True if the nrrd `space directions` form a diagonal matrix."""
+    directions = np.array(directions, dtype=np.float32)
+    return not np.count_nonzero(directions - np.diag(np.diagonal(directions)))
+
+
+def load_nrrd(path: Union[str, Path], mmap: bool = False) -> VoxelData:
+    """Load a nrrd file, optionally as a copy-on-write memory map.
+
+    With `mmap=True`, the data of a raw-encoded (uncompressed) 3D volume with diagonal space
+    directions is memory-mapped instead of being read into memory: only the pages which are read
+    or modified are loaded and the input file is left untouched. Any other nrrd file is loaded
+    with `VoxelData.load_nrrd`.
+
+    Args:
+        path: path to the nrrd file, e.g., the whole brain annotation.
+        mmap: if True, memory-map the data of raw-encoded volumes.
+
+    Returns:
+        VoxelData object holding the content of the nrrd file.
+
+    Raises:
+        AtlasSplitterError if the file is too small to hold the data described by its header.
+    """
+    if not mmap:
+        return VoxelData.load_nrrd(path)
+
+    with open(path, "rb") as nrrd_file:
+        header = nrrd.read_header(nrrd_file)
+        line_skip = int(header.get("line skip", header.get("lineskip", 0)))
+        byte_skip = int(header.get("byte skip", header.get("byteskip", 0)))
+        dtype = _nrrd_dtype(header)
+        if (  # pylint: disable=too-many-boolean-expressions
+            header["encoding"] != "raw"
+            or header["dimension"] != 3
+            or "space directions" not in header
+            or not _is_diagonal(header["space directions"])
+            or any(key in header for key in ["data file", "datafile"])
+            or dtype is None
+            or line_skip < 0
+            or byte_skip < -1
+        ):
+            L.info("Cannot memory-map %s, loading it in memory.", path)
+            return VoxelData.load_nrrd(path)
+
+        # Skip lines, then bytes, as pynrrd does. A byte skip of -1 means that the data are
+        # located at the end of the file.
+        for _ in range(line_skip):
+            nrrd_file.readline()
+        shape = tuple(int(size) for size in header["sizes"])
+        data_size = dtype.itemsize * int(np.prod(shape))
+        file_size = os.path.getsize(path)
+        data_offset = file_size - data_size if byte_skip == -1 else nrrd_file.tell() + byte_skip
+
+    if data_offset < 0 or data_offset + data_size > file_size:
+        raise AtlasSplitterError(
+            f"The file {path} is too small to hold the data described by its header."
+        )
+
+    directions = np.array(header["space directions"], dtype=np.float32)
+    raw = np.memmap(path, dtype=dtype, mode="c", offset=data_offset, shape=shape, order="F")
+    offset = header.get("space origin")
+
+    return VoxelData(
+        raw, np.diagonal(directions), None if offset is None else np.array(offset, np.float32)
+    )
+
 
 def get_isocortex_hierarchy(allen_hierachy: HierarchyDict):
     """
@@ -86,6 +234,36 @@ def _hash_derived_id(acronym: str) -> int:
     return MIN_CUSTOM_ID + integer % (MAX_CUSTOM_ID - MIN_CUSTOM_ID)
 
 
+def unique_acronym_to_id(hierarchy: HierarchyDict) -> Dict[str, int]:
+    """
+    Map the acronyms of the nodes of `hierarchy` to their identifiers, in a single traversal.
+
+    Acronyms shared by several nodes are not mapped, so that a lookup never silently returns
+    one of several candidate identifiers.
+
+    Args:
+        hierarchy: brain regions hierarchy dict.
+
+    Returns:
+        dict whose keys are the acronyms carried by exactly one node of `hierarchy` and whose
+        values are the identifiers of these nodes.
+    """
+    acronym_to_id: Dict[str, int] = {}
+    duplicates = set()
+    nodes = [hierarchy]
+    while nodes:
+        node = nodes.pop()
+        if node["acronym"] in acronym_to_id:
+            duplicates.add(node["acronym"])
+        acronym_to_id[node["acronym"]] = node["id"]
+        nodes.extend(node.get("children", []))
+
+    for acronym in duplicates:
+        del acronym_to_id[acronym]
+
+    return acronym_to_id
+
+
 def _assert_is_leaf_node(node) -> None:
     """
     Raises an AtalasSplitterError if `node` is not a leaf node.
@@ -15,6 +15,8 @@ setup(
         "click>=7.0",
         "cgal-pybind>=0.1.3",
         "numpy>=1.15.0",
+        "orjson>=3.0.0",
+        "pynrrd>=0.4.0",
         "voxcell>=3.0.0",
         "pyarrow>=8.0.0",
     ],
@@ -2,6 +2,7 @@ from pathlib import Path
 from typing import Any, Dict
 
 import numpy as np
+import numpy.testing as npt
 import pandas as pd
 import pytest
 from voxcell import RegionMap, VoxelData
@@ -118,7 +119,6 @@ def test_region_logical_and():
         }
     )
 
-    annotation = VoxelData(raw.copy(), (1.0, 1.0, 1.0))
     annotation = VoxelData(raw.copy(), (1.0, 1.0, 1.0))
     test = np.array(
         np.where(tested.region_logical_and(positions_barrel.values, annotation, [1047]))
@@ -195,6 +195,14 @@ def test_acronym__raises():
         tested._acronym("SSp-bfd", None, "foo")
 
 
+def test_layer_indices():
+    ids = np.array([[0, 981, 1998], [1999, 1047, 4_000_000_000]], dtype=np.uint32)
+    result = tested._layer_indices(ids, [{981}, {201, 1998, 1999}, {1047, 4_000_000_000}])
+    npt.assert_array_equal(result, [[-1, 0, 1], [1, 2, 2]])
+
+    npt.assert_array_equal(tested._layer_indices(ids, []), np.full(ids.shape, -1))
+
+
 def test_edit_volume():
     layers = ["1", "2", "3", "4", "5", "6a", "6b"]
     annotation_test, positions = get_barrel_splitter_input_data()
@@ -381,7 +381,9 @@ def get_barrel_splitter_input_data():
     padding = 1
     x_width = 1
     width = 55  # width along the y and z axes
-    raw = np.zeros((2 * padding + x_width, 2 * padding + width, 2 * padding + width), dtype=int)
+    raw = np.zeros(
+        (2 * padding + x_width, 2 * padding + width, 2 * padding + width), dtype=np.uint32
+    )
 
     raw[1, 0:5, :] = 981
     raw[1, 5:10, :] = 1998
@@ -410,4 +412,4 @@ def get_barrel_splitter_input_data():
 
     positions_barrels = pd.concat([positions_barrel_C2, positions_barrel_C1])
 
-    return VoxelData(raw.copy(), (1.0, 1.0, 1.0)), positions_barrels
+    return VoxelData(raw, (1.0, 1.0, 1.0)), positions_barrels
@@ -112,8 +112,7 @@ def test_edit_hierarchy():
     assert isocortex_hierarchy == expected_hierarchy
 
 
-def test_edit_hierarchy_full_json_file():
-    region_map = RegionMap.load_json(str(Path(TEST_PATH, "1.json")))
+def test_edit_hierarchy_full_json_file(region_map):
     isocortex_ids = region_map.find("Isocortex", attr="acronym", with_descendants=True)
     assert not isocortex_ids & (
         region_map.find("@.*3[ab]?$", attr="acronym") - region_map.find("@.*2/3$", attr="acronym")
@@ -148,12 +147,39 @@ def test_edit_hierarchy_full_json_file():
     assert len(isocortex_layer_3_ids) == len(isocortex_layer_23_ids)
 
 
-def test_split_isocortex_layer_23():
+def test_edit_layer_23_hierarchy_duplicated_acronym():
+    with open(str(Path(TEST_PATH, "1.json")), encoding="utf-8") as h_file:
+        allen_hierarchy = json.load(h_file)
+
+    # PL2 is merged into PL2/3: a region outside the isocortex with the same acronym as PL2/3
+    # makes the lookup ambiguous.
+    root = allen_hierarchy["msg"][0]
+    root["children"][-1]["children"].append(
+        {"id": 999_999, "acronym": "PL2/3", "name": "Duplicate", "children": []}
+    )
+    region_map = RegionMap.from_dict(root)
+    with pytest.raises(AssertionError):
+        tested._edit_layer_23_hierarchy(allen_hierarchy, region_map)
+
+
+def test_as_ids_array():
+    result = tested._as_ids_array({70_000, 219, 107, -1}, np.uint16)
+    assert result.dtype == np.uint16
+    npt.assert_array_equal(result, [107, 219])
+
+    result = tested._as_ids_array({70_000, 219, 107}, np.float32)
+    assert result.dtype == np.int64
+    npt.assert_array_equal(result, [107, 219, 70_000])
+
+
+@pytest.mark.parametrize("dtype", [np.uint32, np.int64, np.float64])
+def test_split_isocortex_layer_23(dtype):
     allen_hierarchy = None
     with open(str(Path(TEST_PATH, "1.json")), encoding="utf-8") as h_file:
         allen_hierarchy = json.load(h_file)
 
     data = get_splitting_input_data()
+    data["annotation"] = data["annotation"].with_data(data["annotation"].raw.astype(dtype))
     tested.split(allen_hierarchy, data["annotation"], data["direction_vectors"], data["ratio"])
     isocortex_hierarchy = tested.get_isocortex_hierarchy(allen_hierarchy)
     modified_region_map = RegionMap.from_dict(isocortex_hierarchy)
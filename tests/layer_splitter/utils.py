@@ -67,7 +67,9 @@ def get_splitting_input_data():
     padding = 1
     x_width = 1
     width = 55  # width along the y and z axes
-    raw = np.zeros((2 * padding + x_width, 2 * padding + width, 2 * padding + width), dtype=int)
+    raw = np.zeros(
+        (2 * padding + x_width, 2 * padding + width, 2 * padding + width), dtype=np.uint32
+    )
 
     ratio = 2.0 / 5.0
     layer_3_top = padding + int((1.0 - ratio) * width)
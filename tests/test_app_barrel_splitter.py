@@ -1,5 +1,6 @@
 from pathlib import Path
 
+import pytest
 from atlas_commons.app_utils import assert_properties
 from click.testing import CliRunner
 from voxcell import RegionMap, VoxelData  # type: ignore
@@ -40,11 +41,13 @@ output_bfd = {
 }
 
 
-def test_split_barrels():
+@pytest.mark.parametrize("compact_json", [False, True])
+@pytest.mark.parametrize("mmap", [False, True])
+def test_split_barrels(mmap, compact_json):
     runner = CliRunner()
     with runner.isolated_filesystem():
         annotation, positions_barrels = get_barrel_splitter_input_data()
-        annotation.save_nrrd("annotation.nrrd")
+        annotation.save_nrrd("annotation.nrrd", encoding="raw" if mmap else None)
         positions_barrels.reset_index(drop=True).to_feather("positions_barrels.feather")
 
         result = runner.invoke(
@@ -61,7 +64,9 @@ def test_split_barrels():
                 "output_hierarchy.json",
                 "--output-annotation-path",
                 "output_annotation.nrrd",
-            ],
+            ]
+            + (["--mmap"] if mmap else [])
+            + (["--compact-json"] if compact_json else []),
         )
 
         assert result.exit_code == 0, str(result.output)
@@ -70,6 +75,7 @@ def test_split_barrels():
         output_annotation = VoxelData.load_nrrd("output_annotation.nrrd")
         assert_properties([input_annotation, output_annotation])
 
+        assert ("\n" in Path("output_hierarchy.json").read_text()) != compact_json
         output_region_map = RegionMap.load_json("output_hierarchy.json")
 
         barrel_cortex_ids = output_region_map.find("SSp-bfd", attr="acronym", with_descendants=True)
@@ -1,6 +1,8 @@
 """test app.layer_splitter"""
 from pathlib import Path
 
+import numpy.testing as npt
+import pytest
 from atlas_commons.app_utils import assert_properties
 from click.testing import CliRunner
 from voxcell import RegionMap, VoxelData  # type: ignore
@@ -11,7 +13,7 @@ from tests.layer_splitter.utils import LAYER_23_IDS, get_splitting_input_data
 TEST_PATH = Path(__file__).parent
 
 
-def _get_result(runner):
+def _get_result(runner, extra_args=()):
     return runner.invoke(
         tested.cli,
         [
@@ -26,28 +28,33 @@ def _get_result(runner):
             "output_hierarchy.json",
             "--output-annotation-path",
             "output_annotation.nrrd",
+            *extra_args,
         ],
     )
 
 
-def _create_files():
+def _create_files(encoding=None):
     data = get_splitting_input_data()
     annotation = data["annotation"]
-    annotation.save_nrrd("annotation.nrrd")
+    annotation.save_nrrd("annotation.nrrd", encoding=encoding)
     direction_vectors = data["direction_vectors"]
     annotation.with_data(direction_vectors).save_nrrd("direction_vectors.nrrd")
 
 
-def test_split_isocortex_layer_23():
+@pytest.mark.parametrize("mmap", [False, True])
+def test_split_isocortex_layer_23(mmap):
     runner = CliRunner()
     with runner.isolated_filesystem():
-        _create_files()
-        result = _get_result(runner)
+        _create_files(encoding="raw" if mmap else None)
+        result = _get_result(runner, ["--mmap"] if mmap else [])
         assert result.exit_code == 0, str(result.output)
 
         input_annotation = VoxelData.load_nrrd("annotation.nrrd")
         output_annotation = VoxelData.load_nrrd("output_annotation.nrrd")
         assert_properties([input_annotation, output_annotation])
+        # The input file is left untouched, in particular when it is memory-mapped
+        npt.assert_array_equal(input_annotation.raw, get_splitting_input_data()["annotation"].raw)
+        assert not set(LAYER_23_IDS) & set(output_annotation.raw.ravel().tolist())
 
         output_region_map = RegionMap.load_json("output_hierarchy.json")
         isocortex_23_ids = output_region_map.find(
@@ -57,3 +64,28 @@ def test_split_isocortex_layer_23():
             "@.*[Ll]ayer 2/3$", attr="name", with_descendants=False
         )
         assert isocortex_23_ids == set(LAYER_23_IDS)
+
+
+def test_split_isocortex_layer_23_mmap_exception():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        _create_files(encoding="raw")
+        result = runner.invoke(
+            tested.cli,
+            [
+                "split-isocortex-layer-23",
+                "--annotation-path",
+                "annotation.nrrd",
+                "--hierarchy-path",
+                str(Path(TEST_PATH, "1.json")),
+                "--direction-vectors-path",
+                "direction_vectors.nrrd",
+                "--output-hierarchy-path",
+                "output_hierarchy.json",
+                "--output-annotation-path",
+                "./annotation.nrrd",
+                "--mmap",
+            ],
+        )
+        assert result.exit_code == 2
+        assert "A memory-mapped annotation file cannot be overwritten." in result.output
@@ -1,10 +1,10 @@
 """Unit tests for utils"""
-import json
 from pathlib import Path
 
 import numpy as np
+import numpy.testing as npt
 import pytest
-from voxcell import RegionMap
+from voxcell import RegionMap, VoxelData
 from voxcell.exceptions import VoxcellError
 
 import atlas_splitter.utils as tested
@@ -49,10 +49,9 @@ def test_get_isocortex_hierarchy():
 
 
 def test_get_isocortex_hierarchy_exception():
-    with open(str(Path(TEST_PATH, "1.json", encoding="utf-8"))) as h_file:
-        allen_hierarchy = json.load(h_file)
-        isocortex_hierarchy = tested.get_isocortex_hierarchy(allen_hierarchy)
-        assert isocortex_hierarchy["acronym"] == "Isocortex"
+    allen_hierarchy = tested.load_json(Path(TEST_PATH, "1.json"))
+    isocortex_hierarchy = tested.get_isocortex_hierarchy(allen_hierarchy)
+    assert isocortex_hierarchy["acronym"] == "Isocortex"
 
 
 def test_id_from_acronym(region_map):
@@ -84,3 +83,102 @@ def _assert_within_integer_type_range(value, int_dtype):
         f"Value not within dtype '{int_dtype.__name__}' range: "
         f"{info.min} <= {value} < {info.max}"
     )
+
+
+def test_unique_acronym_to_id():
+    hierarchy = {
+        "id": 315,
+        "acronym": "Isocortex",
+        "children": [
+            {"id": 1, "acronym": "A2/3", "children": []},
+            {"id": 2, "acronym": "B2/3", "children": [{"id": 3, "acronym": "A2/3"}]},
+        ],
+    }
+    assert tested.unique_acronym_to_id(hierarchy) == {"Isocortex": 315, "B2/3": 2}
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_load_save_json(tmp_path, compact):
+    hierarchy = {
+        "id": 315,
+        "acronym": "Isocortex",
+        "children": [{"id": np.uint32(1), "children": []}],
+    }
+    tested.save_json(tmp_path / "hierarchy.json", hierarchy, compact=compact)
+    assert ("\n" in (tmp_path / "hierarchy.json").read_text()) != compact
+    assert tested.load_json(tmp_path / "hierarchy.json") == {
+        "id": 315,
+        "acronym": "Isocortex",
+        "children": [{"id": 1, "children": []}],
+    }
+
+
+@pytest.mark.parametrize("encoding", ["raw", "gzip"])
+def test_load_nrrd_mmap(tmp_path, encoding):
+    raw = np.arange(24, dtype=np.uint32).reshape(2, 3, 4)
+    VoxelData(raw, (10.0, 10.0, 10.0), (1.0, 2.0, 3.0)).save_nrrd(
+        tmp_path / "annotation.nrrd", encoding=encoding
+    )
+
+    annotation = tested.load_nrrd(tmp_path / "annotation.nrrd", mmap=True)
+    assert isinstance(annotation.raw, np.memmap) == (encoding == "raw")
+    npt.assert_array_equal(annotation.raw, raw)
+    npt.assert_array_equal(annotation.voxel_dimensions, [10.0, 10.0, 10.0])
+    npt.assert_array_equal(annotation.offset, [1.0, 2.0, 3.0])
+
+    # Modifications are not written back to the input file
+    annotation.raw[0, 0, 0] = 42
+    annotation.save_nrrd(tmp_path / "output.nrrd")
+    assert VoxelData.load_nrrd(tmp_path / "output.nrrd").raw[0, 0, 0] == 42
+    assert VoxelData.load_nrrd(tmp_path / "annotation.nrrd").raw[0, 0, 0] == 0
+
+
+@pytest.mark.parametrize(
+    "fields,padding,trailing,big_endian",
+    [
+        (b"", b"", b"trailing bytes", False),
+        (b"byte skip: 5\n", b"12345", b"", False),
+        (b"byte skip: -1\n", b"12345", b"", False),
+        (b"line skip: 2\n", b"first line\nsecond line\n", b"", False),
+        (b"line skip: 1\nbyte skip: 3\n", b"line\n123", b"trailing bytes", False),
+        (b"", b"", b"", True),
+    ],
+)
+def test_load_nrrd_mmap_data_offset(tmp_path, fields, padding, trailing, big_endian):
+    raw = np.arange(24, dtype=np.uint32).reshape(2, 3, 4)
+    VoxelData(raw, (10.0, 10.0, 10.0)).save_nrrd(tmp_path / "input.nrrd", encoding="raw")
+    content = (tmp_path / "input.nrrd").read_bytes()
+    header, data = content[: -raw.nbytes], content[-raw.nbytes :]
+    if big_endian:
+        header = header.replace(b"endian: little", b"endian: big")
+        data = raw.astype(">u4").tobytes(order="F")
+    # The header ends with an empty line
+    (tmp_path / "annotation.nrrd").write_bytes(
+        header[:-1] + fields + b"\n" + padding + data + trailing
+    )
+
+    annotation = tested.load_nrrd(tmp_path / "annotation.nrrd", mmap=True)
+    assert isinstance(annotation.raw, np.memmap)
+    npt.assert_array_equal(annotation.raw, raw)
+
+
+def test_load_nrrd_mmap_non_diagonal(tmp_path):
+    raw = np.arange(24, dtype=np.uint32).reshape(2, 3, 4)
+    VoxelData(raw, (10.0, 10.0, 10.0)).save_nrrd(tmp_path / "annotation.nrrd", encoding="raw")
+    content = (tmp_path / "annotation.nrrd").read_bytes()
+    content = content.replace(b"(10,0,0) (0,10,0)", b"(10,1,0) (0,10,0)", 1)
+    (tmp_path / "annotation.nrrd").write_bytes(content)
+
+    # The file is handed over to voxcell, which does not support non-diagonal space directions
+    with pytest.raises(NotImplementedError):
+        tested.load_nrrd(tmp_path / "annotation.nrrd", mmap=True)
+
+
+def test_load_nrrd_mmap_exception(tmp_path):
+    raw = np.arange(24, dtype=np.uint32).reshape(2, 3, 4)
+    VoxelData(raw, (10.0, 10.0, 10.0)).save_nrrd(tmp_path / "annotation.nrrd", encoding="raw")
+    content = (tmp_path / "annotation.nrrd").read_bytes()
+    (tmp_path / "annotation.nrrd").write_bytes(content[:-4])
+
+    with pytest.raises(AtlasSplitterError, match="too small"):
+        tested.load_nrrd(tmp_path / "annotation.nrrd", mmap=True)